@@ -0,0 +1,275 @@
+import multiprocessing
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from o2qaplots.file_utils import discover_catalog, load_cached_catalog
+from o2qaplots.plot import get_histogram
+
+_EDGE_TOLERANCE = 1e-9
+
+_ARRAY_TYPES = {'TH1D': np.float64, 'TH1F': np.float32, 'TH1I': np.int32, 'TH1S': np.int16, 'TH1C': np.int8}
+
+
+class AlignmentReport:
+    """Summary of the differences between the histograms saved in two files.
+
+    Attributes:
+        added: histograms that are only present in the second file.
+        removed: histograms that are only present in the first file.
+        class_changed: pairs (info_a, info_b) of histograms with the same path but a different ROOT class.
+        binning_changed: histograms whose binning differs between the files.
+        rebinned: histograms with different binning that were rebinned to common edges.
+    """
+
+    def __init__(self):
+        self.added = []
+        self.removed = []
+        self.class_changed = []
+        self.binning_changed = []
+        self.rebinned = []
+
+    def is_aligned(self):
+        """Returns whether the two files have exactly the same histograms and binning."""
+        return not (self.added or self.removed or self.class_changed or self.binning_changed)
+
+    def __str__(self):
+        lines = []
+        for info in self.added:
+            lines.append('Added: ' + info.key)
+        for info in self.removed:
+            lines.append('Removed: ' + info.key)
+        for info_a, info_b in self.class_changed:
+            lines.append('Class changed: ' + info_a.key + ' (' + info_a.root_class + ' -> ' + info_b.root_class + ')')
+        for info in self.binning_changed:
+            if info in self.rebinned:
+                lines.append('Binning changed (rebinned): ' + info.key)
+            else:
+                lines.append('Binning changed (skipped): ' + info.key)
+
+        if not lines:
+            return 'The histograms in both files are aligned.'
+
+        return '\n'.join(lines)
+
+
+def discover_catalog_pair(file_name_a, file_name_b):
+    """Discovers the histograms saved in two files.
+
+    The saved catalogs are read directly. If neither file has one, both files are walked concurrently, each one in a
+    new spawned process, since ROOT holds the GIL while walking a file.
+
+    Returns:
+        A tuple with the HistogramCatalog of each file.
+    """
+    if file_name_a == file_name_b:
+        catalog = discover_catalog(file_name_a)
+        return catalog, catalog
+
+    file_names = (file_name_a, file_name_b)
+    catalogs = [load_cached_catalog(file_name) for file_name in file_names]
+
+    if all(catalog is None for catalog in catalogs):
+        with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context('spawn')) as executor:
+            return tuple(executor.map(discover_catalog, file_names))
+
+    return tuple(catalog if catalog is not None else discover_catalog(file_name)
+                 for file_name, catalog in zip(file_names, catalogs))
+
+
+def _first_occurrences(keys):
+    """Returns the sorted positions of the first occurrence of each value in keys."""
+    _, first = np.unique(keys, return_index=True)
+    return np.sort(first)
+
+
+def join_histograms(catalog_a, catalog_b, report):
+    """Joins the histograms of two catalogs by the hash of their path in the file.
+
+    Args:
+        catalog_a: the HistogramCatalog of the first file.
+        catalog_b: the HistogramCatalog of the second file.
+        report: an AlignmentReport which is filled with the histograms that could not be joined.
+
+    Returns:
+        A list with the HistogramInfo present in both files with the same ROOT class. If a key is repeated in a
+        catalog, only its first histogram is used.
+    """
+    unique_a = _first_occurrences(catalog_a.keys)
+    unique_b = _first_occurrences(catalog_b.keys)
+    keys_a, keys_b = catalog_a.keys[unique_a], catalog_b.keys[unique_b]
+
+    report.removed += [catalog_a.info(i) for i in unique_a[~np.isin(keys_a, keys_b)]]
+    report.added += [catalog_b.info(i) for i in unique_b[~np.isin(keys_b, keys_a)]]
+
+    _, index_a, index_b = np.intersect1d(keys_a, keys_b, return_indices=True)
+    order = np.argsort(index_a)
+    index_a, index_b = unique_a[index_a[order]], unique_b[index_b[order]]
+
+    classes_a = np.array(catalog_a.classes, dtype=str)[catalog_a.root_class[index_a]]
+    classes_b = np.array(catalog_b.classes, dtype=str)[catalog_b.root_class[index_b]]
+    same_class = classes_a == classes_b
+
+    report.class_changed += [(catalog_a.info(i), catalog_b.info(j))
+                             for i, j in zip(index_a[~same_class], index_b[~same_class])]
+
+    return [catalog_a.info(i) for i in index_a[same_class]]
+
+
+def axis_edges(axis):
+    """Returns the bin edges of a ROOT.TAxis as a numpy array."""
+    return np.array([axis.GetBinLowEdge(i) for i in range(1, axis.GetNbins() + 2)])
+
+
+def histogram_edges(histogram):
+    """Returns a list with the bin edges of each axis of a ROOT histogram."""
+    axes = [histogram.GetXaxis(), histogram.GetYaxis(), histogram.GetZaxis()]
+    return [axis_edges(axis) for axis in axes[:histogram.GetDimension()]]
+
+
+def _edge_tolerance(edges):
+    """Distance below which two edges are considered the same, relative to the range of the axis."""
+    return _EDGE_TOLERANCE * (edges[-1] - edges[0])
+
+
+def same_edges(edges_a, edges_b):
+    """Returns whether two arrays of bin edges are the same."""
+    if len(edges_a) != len(edges_b):
+        return False
+    return np.allclose(edges_a, edges_b, rtol=0, atol=_edge_tolerance(edges_a))
+
+
+def common_edges(edges_a, edges_b):
+    """Finds the edges shared by two binnings that cover the same range.
+
+    Args:
+        edges_a: the bin edges of the first histogram.
+        edges_b: the bin edges of the second histogram.
+
+    Returns:
+        The shared edges as a numpy array, or None if the binnings cannot be rebinned to common edges.
+    """
+    tolerance = _edge_tolerance(edges_a)
+
+    if abs(edges_a[0] - edges_b[0]) > tolerance or abs(edges_a[-1] - edges_b[-1]) > tolerance:
+        return None
+
+    position = np.clip(np.searchsorted(edges_b, edges_a), 1, len(edges_b) - 1)
+    distance = np.minimum(np.abs(edges_a - edges_b[position - 1]), np.abs(edges_a - edges_b[position]))
+    shared = edges_a[distance <= tolerance]
+
+    if len(shared) < 2:
+        return None
+
+    return shared
+
+
+def rebin_contents(edges, contents, new_edges):
+    """Merges the bin contents to new_edges, which must be a subset of edges covering the same range.
+
+    Args:
+        edges: the current bin edges.
+        contents: the value in each bin, with size len(edges) - 1.
+        new_edges: the edges of the merged bins.
+
+    Returns:
+        The merged contents, with size len(new_edges) - 1.
+    """
+    tolerance = _edge_tolerance(edges)
+    position = np.searchsorted(edges, new_edges - tolerance)
+    cumulative = np.concatenate(([0.], np.cumsum(contents)))
+    return cumulative[position[1:]] - cumulative[position[:-1]]
+
+
+def rebin_with_flow(edges, values, new_edges):
+    """Merges the values of all the bins of a TH1, including the underflow and overflow, to new_edges.
+
+    Args:
+        edges: the current bin edges.
+        values: the value in each bin, with size len(edges) + 1. The first and last are the underflow and overflow.
+        new_edges: the edges of the merged bins.
+
+    Returns:
+        The merged values, with size len(new_edges) + 1. The underflow and overflow are kept as they are.
+    """
+    return np.concatenate((values[:1], rebin_contents(edges, values[1:-1], new_edges), values[-1:]))
+
+
+def _read_buffer(buffer, dtype, size):
+    """Copies size values of a C++ array returned by ROOT into a numpy array of floats."""
+    return np.frombuffer(buffer, dtype=dtype, count=size).astype(np.float64)
+
+
+def rebin_histogram_1d(histogram, new_edges):
+    """Rebins a TH1 to new_edges, which must be a subset of its own edges.
+
+    Returns:
+        A new ROOT.TH1D with the merged bins. The underflow and overflow are preserved.
+    """
+    import ROOT
+
+    size = histogram.GetNbinsX() + 2
+    edges = axis_edges(histogram.GetXaxis())
+    contents = _read_buffer(histogram.GetArray(), _ARRAY_TYPES[histogram.ClassName()], size)
+
+    if histogram.GetSumw2N() > 0:
+        sum_weights2 = _read_buffer(histogram.GetSumw2().GetArray(), np.float64, size)
+    else:
+        sum_weights2 = contents
+
+    new_contents = rebin_with_flow(edges, contents, new_edges)
+    new_errors = np.sqrt(rebin_with_flow(edges, sum_weights2, new_edges))
+
+    rebinned = ROOT.TH1D(histogram.GetName(), histogram.GetTitle(), len(new_edges) - 1, array('d', new_edges))
+    rebinned.GetXaxis().SetTitle(histogram.GetXaxis().GetTitle())
+    rebinned.GetYaxis().SetTitle(histogram.GetYaxis().GetTitle())
+
+    rebinned.SetContent(new_contents)
+    rebinned.SetError(new_errors)
+    rebinned.SetEntries(histogram.GetEntries())
+
+    return rebinned
+
+
+def align_histograms(file_name_a, file_name_b, rebin=False):
+    """Reads the histograms present in both files, checking that they can be compared.
+
+    Histograms that are missing in one of the files, that changed their ROOT class or that have a different binning
+    are reported and left out of the result.
+
+    Args:
+        file_name_a: the first file.
+        file_name_b: the second file.
+        rebin: if true, TH1 histograms with a different binning are rebinned to the edges shared by both files.
+            Other classes with a different binning, such as TProfile, are always skipped.
+
+    Returns:
+        aligned: a dictionary with {HistogramInfo: (histogram_a, histogram_b)}.
+        report: an AlignmentReport with the differences found between the files.
+    """
+    report = AlignmentReport()
+    catalog_a, catalog_b = discover_catalog_pair(file_name_a, file_name_b)
+    joined = join_histograms(catalog_a, catalog_b, report)
+
+    aligned = dict()
+    for info in joined:
+        histogram_a = get_histogram(file_name_a, info.path, info.name)
+        histogram_b = get_histogram(file_name_b, info.path, info.name)
+
+        edges_a = histogram_edges(histogram_a)
+        edges_b = histogram_edges(histogram_b)
+
+        if all(same_edges(a, b) for a, b in zip(edges_a, edges_b)):
+            aligned[info] = (histogram_a, histogram_b)
+            continue
+
+        report.binning_changed.append(info)
+
+        if rebin and _ARRAY_TYPES.get(info.root_class) is not None:
+            new_edges = common_edges(edges_a[0], edges_b[0])
+            if new_edges is not None:
+                aligned[info] = (rebin_histogram_1d(histogram_a, new_edges), rebin_histogram_1d(histogram_b, new_edges))
+                report.rebinned.append(info)
+
+    return aligned, report
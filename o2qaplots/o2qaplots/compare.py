@@ -3,22 +3,25 @@ import os
 
 import ROOT
 
-from o2qaplots.plot import discover_histograms, plot_1d, plot_profile, get_histogram, save
+from o2qaplots.align import align_histograms
+from o2qaplots.plot import plot_1d, plot_profile, save
 
 parser_description = 'Compare the results of two files'
 from o2qaplots.config import JsonConfig
 
 
 def compare_histograms(file_name_a, file_name_b, output_dir, normalize, label_legend, ratio,
-                       plot_config_file=os.path.dirname(os.path.abspath(__file__)) + '/config/qa_plot_default.json'):
+                       plot_config_file=os.path.dirname(os.path.abspath(__file__)) + '/config/qa_plot_default.json',
+                       rebin=False):
     print(plot_config_file)
 
     json_config = JsonConfig(plot_config_file)
 
-    histograms_info = discover_histograms(file_name_a)
+    aligned, report = align_histograms(file_name_a, file_name_b, rebin)
+    print(report)
 
-    histograms_a = {h: get_histogram(file_name_a, h.path, h.name) for h in histograms_info}
-    histograms_b = {h: get_histogram(file_name_b, h.path, h.name) for h in histograms_info}
+    histograms_a = {info: pair[0] for info, pair in aligned.items()}
+    histograms_b = {info: pair[1] for info, pair in aligned.items()}
 
     histograms_1d_keys = [x for x in histograms_a.keys() if x.root_class.startswith('TH1')]
     histograms_2d_keys = [x for x in histograms_a.keys() if x.root_class.startswith('TH2')]
@@ -44,7 +47,8 @@ def compare_histograms(file_name_a, file_name_b, output_dir, normalize, label_le
 
 def compare(args):
     plot_ratio = not args.no_ratio
-    compare_histograms(args.file1, args.file2, args.output, args.normalize, (args.label1, args.label2), plot_ratio)
+    compare_histograms(args.file1, args.file2, args.output, args.normalize, (args.label1, args.label2), plot_ratio,
+                       rebin=args.rebin)
 
 
 def add_parser_options(parser):
@@ -55,6 +59,8 @@ def add_parser_options(parser):
     parser.add_argument('--output', '-o', help='Location to save the produced files', default="qa_output")
     parser.add_argument('--normalize', '-n', help='Normalize by the integral.', action='store_true', default=False)
     parser.add_argument('--no_ratio', '-nr', help='Do not plot the ratio plot.', action='store_true', default=False)
+    parser.add_argument('--rebin', '-r', help='Rebin histograms with different binning to their common edges.',
+                        action='store_true', default=False)
 
 
 if __name__ == '__main__':
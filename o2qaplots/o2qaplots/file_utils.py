@@ -1,11 +1,21 @@
+import hashlib
+import os
+import tempfile
+import zipfile
 from collections import namedtuple
 
-import ROOT
+import numpy as np
+
+_CATALOG_VERSION = 3
 
 
 class HistogramInfo(namedtuple('HistogramInfoBase', ['path', 'name', 'root_class'])):
-    def __hash__(self):
-        return hash('/'.join(self.path) + '/' + self.name)
+    """Location of a histogram in a file. The path is a tuple with the chain of ROOT.TDirectory it is in."""
+
+    @property
+    def key(self):
+        """The full path of the histogram inside the file, used to match histograms across files."""
+        return '/'.join(self.path) + '/' + self.name
 
 
 def is_root_histogram(class_name: str):
@@ -15,61 +25,249 @@ def is_root_histogram(class_name: str):
     return False
 
 
-def discover_histograms(file_name):
-    """Discovers the histograms saved in a file with multiple TDirectories.
+def is_root_directory(class_name: str):
+    """Returns whether class_name represents a ROOT directory."""
+    return class_name.startswith('TDirectory')
+
+
+def _stable_hash(key):
+    """64 bits hash of a string. Unlike hash(), it does not change between runs, so it can be saved."""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little', signed=True)
+
+
+def _intern(value, table, index):
+    """Returns the position of value in table, appending it if it is not there yet."""
+    position = index.get(value)
+    if position is None:
+        position = len(table)
+        index[value] = position
+        table.append(value)
+    return position
+
+
+class HistogramCatalog:
+    """Compact description of all the histograms saved in a file.
+
+    The directories are stored as a trie: each node keeps the index of its parent node and its own name, with the node 0
+    being the top of the file. Each histogram is a row of arrays with the index of its directory node, of its name and
+    of its ROOT class, and a hash of its full path, used to match histograms across files.
+    """
+
+    def __init__(self, parents, directory_names, names, classes, directory, name, root_class, keys=None):
+        self.parents = np.asarray(parents, dtype=np.int32)
+        self.directory_names = list(directory_names)
+        self.names = list(names)
+        self.classes = list(classes)
+        self.directory = np.asarray(directory, dtype=np.int32)
+        self.name = np.asarray(name, dtype=np.int32)
+        self.root_class = np.asarray(root_class, dtype=np.int32)
+
+        self.paths = [()]
+        for parent, directory_name in zip(self.parents[1:], self.directory_names[1:]):
+            self.paths.append(self.paths[parent] + (directory_name,))
+        self._nodes = {path: node for node, path in enumerate(self.paths)}
+
+        if keys is None:
+            keys = [_stable_hash(self.key(i)) for i in range(len(self))]
+        self.keys = np.asarray(keys, dtype=np.int64)
+
+    @classmethod
+    def from_histograms(cls, histograms):
+        """Builds a catalog from a list of HistogramInfo."""
+        parents, directory_names, nodes = [-1], [''], {(): 0}
+        names, names_index = [], {}
+        classes, classes_index = [], {}
+        directory, name, root_class = [], [], []
+
+        for info in histograms:
+            path = tuple(info.path)
+            if path not in nodes:
+                for depth in range(1, len(path) + 1):
+                    if path[:depth] not in nodes:
+                        nodes[path[:depth]] = len(parents)
+                        parents.append(nodes[path[:depth - 1]])
+                        directory_names.append(path[depth - 1])
+
+            directory.append(nodes[path])
+            name.append(_intern(info.name, names, names_index))
+            root_class.append(_intern(info.root_class, classes, classes_index))
+
+        return cls(parents, directory_names, names, classes, directory, name, root_class)
+
+    @classmethod
+    def from_file(cls, file_name):
+        """Discovers the histograms saved in a file with multiple TDirectories, walking the file only once.
+
+        Only the list of keys is read, no histogram is deserialized. When an object was saved with several cycles,
+        only the highest one is kept.
+        """
+        import ROOT
+
+        file = ROOT.TFile(file_name)
+        histograms = []
+
+        def walk(directory, path):
+            latest_keys = dict()
+            for key in ROOT.TIter(directory.GetListOfKeys()):
+                latest = latest_keys.get(key.GetName())
+                if latest is None or key.GetCycle() > latest.GetCycle():
+                    latest_keys[key.GetName()] = key
+
+            for name, key in latest_keys.items():
+                class_name = key.GetClassName()
+                if is_root_histogram(class_name):
+                    histograms.append(HistogramInfo(path, name, class_name))
+                elif is_root_directory(class_name):
+                    walk(directory.Get(name), path + (name,))
+
+        walk(file, ())
+
+        return cls.from_histograms(histograms)
+
+    @classmethod
+    def load(cls, catalog_file, signature):
+        """Reads a catalog saved with save. Returns None if it was saved for a different signature."""
+        with np.load(catalog_file) as data:
+            if not np.array_equal(data['signature'], signature):
+                return None
+
+            return cls(data['parents'], data['directory_names'].tolist(), data['names'].tolist(),
+                       data['classes'].tolist(), data['directory'], data['name'], data['root_class'], data['keys'])
+
+    def save(self, catalog_file, signature):
+        """Saves the catalog to catalog_file, together with the signature of the file it describes."""
+        directory = os.path.dirname(os.path.abspath(catalog_file))
+        with tempfile.NamedTemporaryFile(dir=directory, suffix='.tmp', delete=False) as file:
+            try:
+                np.savez(file, signature=signature, parents=self.parents,
+                         directory_names=np.array(self.directory_names, dtype=str),
+                         names=np.array(self.names, dtype=str), classes=np.array(self.classes, dtype=str),
+                         directory=self.directory, name=self.name, root_class=self.root_class, keys=self.keys)
+            except BaseException:
+                file.close()
+                os.remove(file.name)
+                raise
+        os.replace(file.name, catalog_file)
+
+    def __len__(self):
+        return len(self.directory)
+
+    def __iter__(self):
+        return (self.info(i) for i in range(len(self)))
+
+    def key(self, i):
+        """The full path of the i-th histogram, the same as HistogramInfo.key."""
+        return '/'.join(self.paths[self.directory[i]]) + '/' + self.names[self.name[i]]
+
+    def info(self, i):
+        """Returns the HistogramInfo of the i-th histogram."""
+        return HistogramInfo(self.paths[self.directory[i]], self.names[self.name[i]],
+                             self.classes[self.root_class[i]])
+
+    def select(self, mask):
+        """Returns a list with the HistogramInfo of the histograms selected by the boolean array mask."""
+        return [self.info(i) for i in np.flatnonzero(mask)]
+
+    def by_type(self, prefix):
+        """Returns the histograms whose ROOT class starts with prefix, such as 'TH1'."""
+        class_ids = [i for i, root_class in enumerate(self.classes) if root_class.startswith(prefix)]
+        return self.select(np.isin(self.root_class, class_ids))
+
+    def by_directory(self, path):
+        """Returns the histograms saved directly in the directory path."""
+        node = self._nodes.get(tuple(path))
+        if node is None:
+            return []
+        return self.select(self.directory == node)
+
+    def by_prefix(self, path):
+        """Returns the histograms saved in the directory path or in any of its sub directories."""
+        path = tuple(path)
+        nodes = [node for node, node_path in enumerate(self.paths) if node_path[:len(path)] == path]
+        return self.select(np.isin(self.directory, nodes))
+
+    def sub_directories(self, path=()):
+        """Returns the names of the directories inside the directory path."""
+        node = self._nodes.get(tuple(path))
+        return [self.directory_names[i] for i in np.flatnonzero(self.parents == node)]
+
+
+def catalog_file_name(file_name):
+    """Name of the file in which the catalog of file_name is saved."""
+    return file_name + '.catalog.npz'
+
+
+def _file_signature(file_name):
+    """Identifies the version of a file by its size and modification time."""
+    status = os.stat(file_name)
+    return np.array([_CATALOG_VERSION, status.st_size, status.st_mtime_ns], dtype=np.int64)
+
+
+def load_cached_catalog(file_name):
+    """Reads the catalog saved next to file_name.
+
+    Returns:
+        The HistogramCatalog, or None if file_name is not a local file or if there is no valid catalog for its current
+        size and modification time.
+    """
+    catalog_file = catalog_file_name(file_name)
+    if not os.path.isfile(file_name) or not os.path.isfile(catalog_file):
+        return None
+
+    try:
+        return HistogramCatalog.load(catalog_file, _file_signature(file_name))
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        return None
+
+
+def discover_catalog(file_name, use_cache=True):
+    """Builds the HistogramCatalog of a file.
 
     Args:
-        file_name: the file to be inspected.
+        file_name: the file to be inspected. It can be any name accepted by ROOT.TFile, such as a XRootD path.
+        use_cache: if true and file_name is a local file, the catalog is saved next to the file and reused while the
+            file size and modification time do not change.
 
-    Returns
-        histograms: a list with HistogramInfo for each histogram.
+    Returns:
+        catalog: the HistogramCatalog of the file.
     """
-    file = ROOT.TFile(file_name)
-    file_iterator = ROOT.TIter(file.GetListOfKeys())
-    histograms = list()
+    use_cache = use_cache and os.path.isfile(file_name)
 
-    path = []
-    it = file_iterator
-    loop_list(path, it, histograms, file)
+    if use_cache:
+        catalog = load_cached_catalog(file_name)
+        if catalog is not None:
+            return catalog
 
-    return histograms
+    catalog = HistogramCatalog.from_file(file_name)
 
+    if use_cache:
+        try:
+            catalog.save(catalog_file_name(file_name), _file_signature(file_name))
+        except OSError:
+            pass
 
-def loop_list(path, it, histograms, directory):
-    for key in it:
-        if is_root_histogram(key.GetClassName()):
-            histogram = HistogramInfo(path, key.GetName(), key.GetClassName())
-            histograms.append(histogram)
-        else:
-            new_path = path + [key.GetName()]
-            new_directory = directory.Get(key.GetName())
-            iterator_dir = ROOT.TIter(new_directory.GetListOfKeys())
-            loop_list(new_path, iterator_dir, histograms, new_directory)
-
-    # for category_key in file_iterator:
-    #     category = file.Get(category_key.GetName())
-    #
-    #     for hist_or_dir in ROOT.TIter(category.GetListOfKeys()):
-    #         if is_root_histogram(hist_or_dir.GetClassName()):
-    #             histogram = HistogramInfo(category_key.GetName(), None, hist_or_dir.GetName(), hist_or_dir.GetClassName())
-    #             histograms.append(histogram)
-    #
-    #         else:
-    #             sub_category = category.Get(hist_or_dir.GetName())
-    #
-    #             for hist in ROOT.TIter(sub_category.GetListOfKeys()):
-    #                 histogram = HistogramInfo(category_key.GetName(), hist_or_dir.GetName(),
-    #                                           hist.GetName(), hist.GetClassName())
-    #                 histograms.append(histogram)
+    return catalog
 
-    return histograms
+
+def discover_histograms(file_name):
+    """Discovers the histograms saved in a file with multiple TDirectories.
+
+    Args:
+        file_name: the file to be inspected.
+
+    Returns
+        histograms: a list with HistogramInfo for each histogram.
+    """
+    return list(discover_catalog(file_name))
 
 
 def discover_categories(file_name):
-    file = ROOT.TFile(file_name)
-    file_iterator = ROOT.TIter(file.GetListOfKeys())
+    """Returns the names of the top level directories of a file.
 
-    return [category_key.GetName() for category_key in file_iterator]
+    Only directories containing at least one histogram, directly or in a sub directory, are listed. Top level objects
+    that are not directories are not listed.
+    """
+    return discover_catalog(file_name).sub_directories()
 
 
 def discover_histograms_by_type(file_name):
@@ -79,24 +277,17 @@ def discover_histograms_by_type(file_name):
         file_name: the file to be inspected.
 
     Returns
-        histograms: a dictionary with {folder: {type: [histogram_name, ] }]}
+        histograms: a dictionary with {folder: {type: [histogram_name, ] }]}. Only the histograms are included:
+            sub directories and other objects in the folders are not listed.
     """
-    file = ROOT.TFile(file_name)
-    file_iterator = ROOT.TIter(file.GetListOfKeys())
+    catalog = discover_catalog(file_name)
     histograms = dict()
 
-    for category_key in file_iterator:
-        category = file.Get(category_key.GetName())
-
+    for category in catalog.sub_directories():
         histograms_this_cat = dict()
-        for histogram in ROOT.TIter(category.GetListOfKeys()):
-            histogram_class = histogram.GetClassName()
-
-            if histogram_class not in histograms_this_cat.keys():
-                histograms_this_cat[histogram_class] = [histogram.GetName()]
-            else:
-                histograms_this_cat[histogram_class] += [histogram.GetName()]
+        for info in catalog.by_directory((category,)):
+            histograms_this_cat.setdefault(info.root_class, []).append(info.name)
 
-        histograms[category_key.GetName()] = histograms_this_cat
+        histograms[category] = histograms_this_cat
 
     return histograms
@@ -3,7 +3,7 @@ import os
 import os.path
 import pathlib
 
-from o2qaplots.file_utils import discover_histograms, HistogramInfo
+from o2qaplots.file_utils import discover_catalog, HistogramInfo
 from o2qaplots.plot_mpl import plot_1d_mpl
 from o2qaplots.plot_root import plot_1d_root, profile_histogram_root
 
@@ -130,11 +130,11 @@ def _check_file_saved(file):
 def plot_histograms(file_name, output_dir, normalize, backend,
                     plot_config_file=os.path.dirname(os.path.abspath(__file__)) + '/config/qa_plot_default.json'):
     json_config = JsonConfig(plot_config_file)
-    histograms_info = discover_histograms(file_name)
+    catalog = discover_catalog(file_name)
 
-    histograms = {h: get_histogram(file_name, h.path, h.name, backend) for h in histograms_info}
-    histograms_1d_keys = [x for x in histograms.keys() if x.root_class.startswith('TH1')]
-    histograms_2d_keys = [x for x in histograms.keys() if x.root_class.startswith('TH2')]
+    histograms = {h: get_histogram(file_name, h.path, h.name, backend) for h in catalog}
+    histograms_1d_keys = catalog.by_type('TH1')
+    histograms_2d_keys = catalog.by_type('TH2')
 
     plot_hist_1d = {info: plot_1d([histograms[info]], normalize, False, backend, plot_config=json_config.get(info.name))
                     for info in histograms_1d_keys}
@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+
+import o2qaplots.align as align
+from o2qaplots.align import AlignmentReport, join_histograms, common_edges, rebin_contents, rebin_with_flow, same_edges
+from o2qaplots.file_utils import HistogramInfo, HistogramCatalog
+
+
+def test_join_histograms():
+    catalog_a = HistogramCatalog.from_histograms([HistogramInfo(('tracks',), 'pt', 'TH1D'),
+                                                  HistogramInfo(('tracks',), 'eta', 'TH1D'),
+                                                  HistogramInfo(('tracks',), 'phi', 'TH1D'),
+                                                  HistogramInfo(('vertex',), 'x', 'TH1D')])
+    catalog_b = HistogramCatalog.from_histograms([HistogramInfo(('tracks',), 'phi', 'TH1D'),
+                                                  HistogramInfo(('tracks',), 'pt', 'TH1D'),
+                                                  HistogramInfo(('tracks',), 'eta', 'TH2D'),
+                                                  HistogramInfo(('vertex',), 'y', 'TH1D')])
+
+    report = AlignmentReport()
+    joined = join_histograms(catalog_a, catalog_b, report)
+
+    assert joined == [HistogramInfo(('tracks',), 'pt', 'TH1D'), HistogramInfo(('tracks',), 'phi', 'TH1D')]
+    assert report.removed == [HistogramInfo(('vertex',), 'x', 'TH1D')]
+    assert report.added == [HistogramInfo(('vertex',), 'y', 'TH1D')]
+    assert [(a.key, b.root_class) for a, b in report.class_changed] == [('tracks/eta', 'TH2D')]
+    assert not report.is_aligned()
+
+
+def test_common_edges():
+    edges_a = np.linspace(0., 10., 11)
+    edges_b = np.linspace(0., 10., 6)
+
+    assert np.allclose(common_edges(edges_a, edges_b), edges_b)
+    assert common_edges(edges_a, np.linspace(0., 20., 11)) is None
+
+
+def test_rebin_contents():
+    edges = np.linspace(0., 10., 11)
+    contents = np.arange(10.)
+
+    rebinned = rebin_contents(edges, contents, np.array([0., 2., 5., 10.]))
+
+    assert np.allclose(rebinned, [1., 9., 35.])
+
+
+def test_join_histograms_repeated_key():
+    catalog_a = HistogramCatalog.from_histograms([HistogramInfo(('tracks',), 'pt', 'TH1D'),
+                                                  HistogramInfo(('tracks',), 'pt', 'TH1D'),
+                                                  HistogramInfo(('tracks',), 'eta', 'TH1D')])
+    catalog_b = HistogramCatalog.from_histograms([HistogramInfo(('tracks',), 'eta', 'TH1D'),
+                                                  HistogramInfo(('tracks',), 'pt', 'TH1D')])
+
+    report = AlignmentReport()
+    joined = join_histograms(catalog_a, catalog_b, report)
+
+    assert joined == [HistogramInfo(('tracks',), 'pt', 'TH1D'), HistogramInfo(('tracks',), 'eta', 'TH1D')]
+    assert report.is_aligned()
+
+
+def test_same_edges():
+    edges = np.linspace(0., 10., 11)
+
+    assert same_edges(edges, edges + 1e-17)
+    assert same_edges(np.array([0., 1.]), np.array([1e-17, 1.]))
+    assert not same_edges(edges, np.linspace(0., 10., 6))
+    assert not same_edges(edges, edges + 0.5)
+
+
+def test_rebin_with_flow():
+    edges = np.linspace(0., 4., 5)
+    values = np.array([10., 1., 2., 3., 4., 20.])
+
+    rebinned = rebin_with_flow(edges, values, np.array([0., 2., 4.]))
+
+    assert np.allclose(rebinned, [10., 3., 7., 20.])
+
+
+@pytest.fixture
+def fake_files(monkeypatch):
+    """Replaces the reading of the files by histograms described only by their bin edges."""
+    histograms = {'a': {'pt': [np.linspace(0., 10., 11)],
+                        'eta': [np.linspace(-1., 1., 5)],
+                        'ptProfile': [np.linspace(0., 10., 11)]},
+                  'b': {'pt': [np.linspace(0., 10., 11)],
+                        'eta': [np.linspace(-1., 1., 3)],
+                        'ptProfile': [np.linspace(0., 10., 6)]}}
+    classes = {'pt': 'TH1D', 'eta': 'TH1D', 'ptProfile': 'TProfile'}
+
+    catalog = HistogramCatalog.from_histograms([HistogramInfo(('tracks',), name, root_class)
+                                                for name, root_class in classes.items()])
+
+    monkeypatch.setattr(align, 'discover_catalog_pair', lambda file_name_a, file_name_b: (catalog, catalog))
+    monkeypatch.setattr(align, 'get_histogram', lambda file_name, path, name: histograms[file_name][name])
+    monkeypatch.setattr(align, 'histogram_edges', lambda histogram: histogram)
+    monkeypatch.setattr(align, 'rebin_histogram_1d', lambda histogram, new_edges: [new_edges])
+
+
+def test_align_histograms(fake_files):
+    aligned, report = align.align_histograms('a', 'b')
+
+    assert [info.name for info in aligned] == ['pt']
+    assert [info.name for info in report.binning_changed] == ['eta', 'ptProfile']
+    assert report.rebinned == []
+
+
+def test_align_histograms_rebin(fake_files):
+    aligned, report = align.align_histograms('a', 'b', rebin=True)
+
+    assert [info.name for info in aligned] == ['pt', 'eta']
+    assert np.allclose(aligned[HistogramInfo(('tracks',), 'eta', 'TH1D')][0][0], [-1., 0., 1.])
+    assert [info.name for info in report.rebinned] == ['eta']
+    assert 'Binning changed (skipped): tracks/ptProfile' in str(report)
+
+
+def test_discover_catalog_pair_cached(monkeypatch):
+    catalogs = {'a': HistogramCatalog.from_histograms([HistogramInfo(('tracks',), 'pt', 'TH1D')]),
+                'b': HistogramCatalog.from_histograms([HistogramInfo(('tracks',), 'eta', 'TH1D')])}
+    walked = []
+
+    def discover_catalog(file_name):
+        walked.append(file_name)
+        return catalogs[file_name]
+
+    monkeypatch.setattr(align, 'load_cached_catalog', lambda file_name: catalogs['a'] if file_name == 'a' else None)
+    monkeypatch.setattr(align, 'discover_catalog', discover_catalog)
+
+    assert align.discover_catalog_pair('a', 'b') == (catalogs['a'], catalogs['b'])
+    assert walked == ['b']
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from o2qaplots.file_utils import HistogramInfo, HistogramCatalog, catalog_file_name, discover_catalog
+
+
+@pytest.fixture
+def catalog():
+    histograms = [HistogramInfo(('tracks',), 'pt', 'TH1D'),
+                  HistogramInfo(('tracks', 'primary'), 'pt', 'TH1D'),
+                  HistogramInfo(('tracks', 'primary'), 'ptVsEta', 'TH2D'),
+                  HistogramInfo(('vertex',), 'x', 'TH1F'),
+                  HistogramInfo((), 'events', 'TH1I')]
+    return HistogramCatalog.from_histograms(histograms)
+
+
+def test_catalog_interning(catalog):
+    assert len(catalog) == 5
+    assert catalog.names == ['pt', 'ptVsEta', 'x', 'events']
+    assert catalog.classes == ['TH1D', 'TH2D', 'TH1F', 'TH1I']
+
+    infos = list(catalog)
+    assert infos[0].path is catalog.paths[catalog.directory[0]]
+    assert infos[1].path is infos[2].path
+    assert infos[4].key == '/events'
+
+
+def test_catalog_views(catalog):
+    assert [info.key for info in catalog.by_type('TH1')] == ['tracks/pt', 'tracks/primary/pt', 'vertex/x', '/events']
+    assert catalog.by_type('TH2') == [HistogramInfo(('tracks', 'primary'), 'ptVsEta', 'TH2D')]
+    assert [info.name for info in catalog.by_directory(('tracks', 'primary'))] == ['pt', 'ptVsEta']
+    assert [info.key for info in catalog.by_prefix(('tracks',))] == ['tracks/pt', 'tracks/primary/pt',
+                                                                    'tracks/primary/ptVsEta']
+    assert catalog.by_directory(('missing',)) == []
+    assert catalog.sub_directories() == ['tracks', 'vertex']
+    assert catalog.sub_directories(('tracks',)) == ['primary']
+
+
+def test_catalog_save_load(catalog, tmp_path):
+    catalog_file = str(tmp_path / 'file.root.catalog.npz')
+    signature = np.array([1, 1024, 123456789], dtype=np.int64)
+    catalog.save(catalog_file, signature)
+
+    loaded = HistogramCatalog.load(catalog_file, signature)
+    assert list(loaded) == list(catalog)
+    assert np.array_equal(loaded.keys, catalog.keys)
+
+    assert HistogramCatalog.load(catalog_file, signature + 1) is None
+
+
+def test_discover_catalog_corrupted_cache(catalog, tmp_path, monkeypatch):
+    file_name = str(tmp_path / 'file.root')
+    with open(file_name, 'wb') as file:
+        file.write(b'root')
+    with open(catalog_file_name(file_name), 'wb') as file:
+        file.write(b'PK\x03\x04truncated')
+
+    monkeypatch.setattr(HistogramCatalog, 'from_file', classmethod(lambda cls, name: catalog))
+
+    assert list(discover_catalog(file_name)) == list(catalog)
+    monkeypatch.setattr(HistogramCatalog, 'from_file', None)
+    assert list(discover_catalog(file_name)) == list(catalog)
+
+
+def test_discover_catalog_not_local(catalog, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(HistogramCatalog, 'from_file', classmethod(lambda cls, name: catalog))
+
+    assert list(discover_catalog('root://eos.example.org//qa/AnalysisResults.root')) == list(catalog)
+    assert list(tmp_path.iterdir()) == []